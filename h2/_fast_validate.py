@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+h2/_fast_validate
+~~~~~~~~~~~~~~~~~
+
+Optional JIT-compiled header-name scanning.
+
+When Numba and NumPy are available, this module exposes
+``scan_header_name``, which scans a bytes header name for everything we
+forbid — uppercase characters, leading or trailing whitespace, and embedded
+NUL/CR/LF — in a single LLVM-compiled loop, and returns a bit-packed status
+(bit 0: uppercase, bit 1: surrounding whitespace, bit 2: forbidden control
+character). Any non-zero return means the name must be rejected.
+
+Neither Numba nor NumPy is a dependency of this package: when they are not
+installed, ``scan_header_name`` is ``None`` and the validation code in
+``h2.utilities`` falls back to its regex scan.
+"""
+try:
+    import numpy
+    from numba import njit
+except ImportError:  # Platform-specific: Numba or NumPy not installed.
+    scan_header_name = None
+else:
+    @njit(cache=True)
+    def _scan(buf):
+        status = 0
+        length = buf.shape[0]
+        if length == 0:
+            return status
+
+        for i in range(length):
+            char = buf[i]
+            # A-Z
+            if 65 <= char <= 90:
+                status |= 1
+            # NUL, LF, CR
+            elif char == 0 or char == 10 or char == 13:
+                status |= 4
+
+        # Space, HT, LF, VT, FF, CR at either end of the name.
+        first = buf[0]
+        last = buf[length - 1]
+        if (first == 32 or 9 <= first <= 13 or
+                last == 32 or 9 <= last <= 13):
+            status |= 2
+
+        return status
+
+    def scan_header_name(name):
+        """
+        Scans a bytes header name for forbidden characters, returning a
+        non-zero status if any were found.
+        """
+        return _scan(numpy.frombuffer(name, dtype=numpy.uint8))
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+h2/_validate
+~~~~~~~~~~~~
+
+Optional Cython-compiled implementation of the fused inbound header
+validator. This is a behavioural copy of ``h2.utilities.validate_headers``:
+the pure-Python version there is authoritative, and this module only exists
+to run the same loop without interpreter dispatch when the extension has
+been built. It is never required: when the compiled module is absent,
+``h2.utilities`` simply keeps its own implementation.
+
+The constants below deliberately mirror the ones in ``h2.utilities``; they
+are redefined here rather than imported to keep this module importable
+without triggering a circular import.
+"""
+import re
+from string import whitespace
+import sys
+
+from .exceptions import ProtocolError
+
+
+_BAD_NAME_RE = re.compile(
+    b"[A-Z]|^[ \t\n\r\x0b\x0c]|[ \t\n\r\x0b\x0c]$|[\x00\r\n]"
+)
+_BAD_NAME_RE_U = re.compile(
+    u"[A-Z]|^[ \t\n\r\x0b\x0c]|[ \t\n\r\x0b\x0c]$|[\x00\r\n]"
+)
+
+CONNECTION_HEADERS = frozenset([
+    b'connection', u'connection',
+    b'proxy-connection', u'proxy-connection',
+    b'keep-alive', u'keep-alive',
+    b'transfer-encoding', u'transfer-encoding',
+    b'upgrade', u'upgrade',
+])
+
+_HEADER_KIND = {
+    b':method': 1, u':method': 1,
+    b':scheme': 1, u':scheme': 1,
+    b':authority': 1, u':authority': 1,
+    b':path': 1, u':path': 1,
+    b':status': 1, u':status': 1,
+}
+
+_TE = frozenset([b'te', u'te'])
+_TRAILERS = frozenset([b'trailers', u'trailers'])
+_AUTHORITY = frozenset([b':authority', u':authority'])
+_HOST = frozenset([b'host', u'host'])
+_STATUS = frozenset([b':status', u':status'])
+_COLON = frozenset([b':', u':'])
+
+if sys.version_info[0] == 2:  # Python 2.X
+    _WHITESPACE = frozenset(whitespace)
+else:  # Python 3.3+
+    _WHITESPACE = frozenset(map(ord, whitespace))
+
+
+cpdef list validate_headers_c(headers, hdr_validation_flags):
+    """
+    Validates a header sequence against a set of constraints from RFC 7540.
+
+    :param headers: The HTTP header set.
+    :param hdr_validation_flags: An instance of HeaderValidationFlags.
+    """
+    cdef list out = []
+    cdef set seen_pseudo_header_fields = set()
+    cdef bint seen_regular_header = False
+
+    authority_header_val = None
+    host_header_val = None
+
+    for header in headers:
+        name = header[0]
+        value = header[1]
+
+        # Reject names containing uppercase characters, surrounded by
+        # whitespace, or containing embedded NUL/CR/LF, in a single scan.
+        if isinstance(name, bytes):
+            bad_name = _BAD_NAME_RE.search(name)
+        else:
+            bad_name = _BAD_NAME_RE_U.search(name)
+        if bad_name:
+            raise ProtocolError(
+                "Received header name with forbidden characters %r" % name)
+
+        # Reject values surrounded by whitespace. For compatibility with RFC
+        # 7230 header fields, we need to allow the field value to be an empty
+        # string. This is ludicrous, but technically allowed. Note that the
+        # membership test is the exact one the pure-Python validator uses:
+        # on Python 3 the set holds integers, so only bytes values are ever
+        # caught here, and text values fall through just as they do there.
+        if value and ((value[0] in _WHITESPACE) or
+           (value[-1] in _WHITESPACE)):
+            raise ProtocolError(
+                "Received header value surrounded by whitespace %r" % value
+            )
+
+        # The TE header may only carry the value "trailers".
+        if name in _TE:
+            if len(value) != 8 or value.lower() not in _TRAILERS:
+                raise ProtocolError(
+                    "Invalid value for Transfer-Encoding header: %s" %
+                    value
+                )
+
+        # Reject connection-specific header fields.
+        if name in CONNECTION_HEADERS:
+            raise ProtocolError(
+                "Connection-specific header field present: %s." % name
+            )
+
+        # Reject duplicate, misplaced, and custom pseudo-header fields.
+        if _HEADER_KIND.get(name) == 1:
+            if name in seen_pseudo_header_fields:
+                raise ProtocolError(
+                    "Received duplicate pseudo-header field %s" % name
+                )
+
+            seen_pseudo_header_fields.add(name)
+
+            if seen_regular_header:
+                raise ProtocolError(
+                    "Received pseudo-header field out of sequence: %s" %
+                    name
+                )
+
+            if name in _AUTHORITY:
+                authority_header_val = value
+        elif name[:1] in _COLON:
+            raise ProtocolError(
+                "Received custom pseudo-header field %s" % name
+            )
+        else:
+            seen_regular_header = True
+
+            if name in _HOST:
+                host_header_val = value
+
+        out.append(header)
+
+    # Pseudo-header fields MUST NOT appear in trailers - RFC 7540 § 8.1.2.1
+    if hdr_validation_flags.is_trailer and seen_pseudo_header_fields:
+        raise ProtocolError(
+            "Received pseudo-header in trailer %s" %
+            seen_pseudo_header_fields
+        )
+
+    # If ':status' pseudo-header is not there in a response header, reject it
+    # Relevant RFC section: RFC 7540 § 8.1.2.4
+    # https://tools.ietf.org/html/rfc7540#section-8.1.2.4
+    if hdr_validation_flags.is_response_header:
+        if not (b':status' in seen_pseudo_header_fields or
+                u':status' in seen_pseudo_header_fields):
+            raise ProtocolError(
+                "Response header block does not have a :status header"
+            )
+
+    # We only expect to see :authority and Host headers on request header
+    # blocks that aren't trailers, so skip this validation if this is a
+    # response header or we're looking at trailer blocks.
+    if not (hdr_validation_flags.is_response_header or
+            hdr_validation_flags.is_trailer):
+        if authority_header_val is None and host_header_val is None:
+            raise ProtocolError(
+                "Request header block does not have an :authority or "
+                "Host header."
+            )
+        if authority_header_val is not None and host_header_val is not None:
+            if authority_header_val != host_header_val:
+                raise ProtocolError(
+                    "Request header block has mismatched :authority and "
+                    "Host headers: %r / %r"
+                    % (authority_header_val, host_header_val)
+                )
+
+    return out
@@ -219,8 +219,38 @@ class H2ConnectionStateMachine(object):
             (None, ConnectionState.CLOSED),
     }
 
+    # The _transitions dictionary above is the readable definition of the
+    # state machine, but looking transitions up in it requires allocating a
+    # (state, input) tuple and hashing two Enum objects on every call. To
+    # avoid that, flatten it once at class definition time into a list
+    # indexed by ``state.value * _input_count + input_.value``, with ``None``
+    # marking invalid transitions.
+    # Transitions without a side-effect function store the list constructor
+    # in its place: calling it builds the fresh empty event list the
+    # transition should return, so dispatch below is an unconditional call
+    # rather than a branch on None.
+    _input_count = len(ConnectionInputs)
+    _transition_table = [None] * (len(ConnectionState) * _input_count)
+    for _key, _value in _transitions.items():
+        _transition_table[_key[0].value * _input_count + _key[1].value] = (
+            (_value[0] if _value[0] is not None else list, _value[1].value)
+        )
+    del _key, _value
+
     def __init__(self):
-        self.state = ConnectionState.IDLE
+        self._state = ConnectionState.IDLE.value
+
+    # The state is stored internally as a plain int: ints hash and compare
+    # in C, where Enum members dispatch through Python-level machinery, and
+    # the transition table is indexed by the raw value anyway. The Enum
+    # member is rebuilt on access for compatibility.
+    @property
+    def state(self):
+        return ConnectionState(self._state)
+
+    @state.setter
+    def state(self, state):
+        self._state = state.value
 
     def process_input(self, input_):
         """
@@ -229,20 +259,20 @@ class H2ConnectionStateMachine(object):
         if not isinstance(input_, ConnectionInputs):
             raise ValueError("Input must be an instance of ConnectionInputs")
 
-        try:
-            func, target_state = self._transitions[(self.state, input_)]
-        except KeyError:
-            old_state = self.state
-            self.state = ConnectionState.CLOSED
+        entry = self._transition_table[
+            self._state * self._input_count + input_.value
+        ]
+        if entry is None:
+            old_state = self._state
+            self._state = ConnectionState.CLOSED.value
             raise ProtocolError(
-                "Invalid input %s in state %s" % (input_, old_state)
+                "Invalid input %s in state %s" %
+                (input_, ConnectionState(old_state))
             )
-        else:
-            self.state = target_state
-            if func is not None:  # pragma: no cover
-                return func()
 
-            return []
+        func = entry[0]
+        self._state = entry[1]
+        return func()
 
 
 class H2Connection(object):
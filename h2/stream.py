@@ -26,8 +26,8 @@ from .exceptions import (
 )
 from .utilities import (
     guard_increment_window, is_informational_response, authority_from_headers,
-    validate_headers, validate_outbound_headers, normalize_outbound_headers,
-    HeaderValidationFlags, extract_method_header
+    validate_headers, prepare_outbound_headers, make_header_validation_flags,
+    extract_method_header
 )
 from .windows import WindowManager
 
@@ -1266,7 +1266,7 @@ class H2Stream(object):
             events[0], (PushedStreamReceived, _PushedRequestSent)
         )
 
-        return HeaderValidationFlags(
+        return make_header_validation_flags(
             is_client=self.state_machine.client,
             is_trailer=is_trailer,
             is_response_header=is_response_header,
@@ -1282,15 +1282,13 @@ class H2Stream(object):
         Helper method to build headers or push promise frames.
         """
         # We need to lowercase the header names, and to ensure that secure
-        # header fields are kept out of compression contexts.
-        if self.config.normalize_outbound_headers:
-            headers = normalize_outbound_headers(
-                headers, hdr_validation_flags
-            )
-        if self.config.validate_outbound_headers:
-            headers = validate_outbound_headers(
-                headers, hdr_validation_flags
-            )
+        # header fields are kept out of compression contexts. Normalization
+        # and validation happen in one pass over the block.
+        headers = prepare_outbound_headers(
+            headers, hdr_validation_flags,
+            normalize=self.config.normalize_outbound_headers,
+            validate=self.config.validate_outbound_headers,
+        )
 
         encoded_headers = encoder.encode(headers)
 
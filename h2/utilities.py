@@ -12,36 +12,148 @@ import sys
 
 from hpack import HeaderTuple, NeverIndexedHeaderTuple
 
+from ._fast_validate import scan_header_name
 from .exceptions import ProtocolError, FlowControlError
+from .windows import LARGEST_FLOW_CONTROL_WINDOW
 
 UPPER_RE = re.compile(b"[A-Z]")
 
+# A single pattern that catches everything we forbid in a header name:
+# uppercase characters, leading or trailing whitespace, and embedded
+# NUL/CR/LF. One C-side regex scan replaces several Python-level character
+# probes per header. A Unicode sibling handles names supplied as text.
+_BAD_NAME_RE = re.compile(
+    b"[A-Z]|^[ \t\n\r\x0b\x0c]|[ \t\n\r\x0b\x0c]$|[\x00\r\n]"
+)
+_BAD_NAME_RE_U = re.compile(
+    u"[A-Z]|^[ \t\n\r\x0b\x0c]|[ \t\n\r\x0b\x0c]$|[\x00\r\n]"
+)
+
+# Matches byte values that carry leading or trailing whitespace and so
+# actually need stripping. Most in-process producers hand us clean headers
+# already, and .lower() always allocates a copy even when nothing changes,
+# so the normalization path tests with this (and _BAD_NAME_RE for names)
+# and leaves clean bytes headers untouched. Note that this only mirrors
+# bytes.strip(): str.strip() also removes non-ASCII Unicode whitespace, so
+# text headers can't take this shortcut.
+_WS_EDGE_RE = re.compile(b"^[ \t\n\r\x0b\x0c]|[ \t\n\r\x0b\x0c]$")
+
+# Whether the optional JIT-compiled header-name scanner is available.
+_FAST_SCAN = scan_header_name is not None
+
+try:
+    _intern = sys.intern
+except AttributeError:  # Platform-specific: Python 2
+    _intern = intern  # noqa
+
+# Canonical singletons for the header names this module tests against.
+# Interning the text spellings (and binding the byte spellings once) means
+# every set and dict below shares the same objects, so lookups from code
+# that uses the same constants hit CPython's pointer-identity fast path
+# before falling back to a full comparison.
+_CONNECTION_B, _CONNECTION_S = b'connection', _intern(u'connection')
+_PROXY_CONNECTION_B = b'proxy-connection'
+_PROXY_CONNECTION_S = _intern(u'proxy-connection')
+_KEEP_ALIVE_B, _KEEP_ALIVE_S = b'keep-alive', _intern(u'keep-alive')
+_TRANSFER_ENCODING_B = b'transfer-encoding'
+_TRANSFER_ENCODING_S = _intern(u'transfer-encoding')
+_UPGRADE_B, _UPGRADE_S = b'upgrade', _intern(u'upgrade')
+_METHOD_B, _METHOD_S = b':method', _intern(u':method')
+_SCHEME_B, _SCHEME_S = b':scheme', _intern(u':scheme')
+_AUTHORITY_B, _AUTHORITY_S = b':authority', _intern(u':authority')
+_PATH_B, _PATH_S = b':path', _intern(u':path')
+_STATUS_B, _STATUS_S = b':status', _intern(u':status')
+_TE_B, _TE_S = b'te', _intern(u'te')
+_TRAILERS_B, _TRAILERS_S = b'trailers', _intern(u'trailers')
+_COOKIE_B, _COOKIE_S = b'cookie', _intern(u'cookie')
+_HOST_B, _HOST_S = b'host', _intern(u'host')
+_AUTHORIZATION_B = b'authorization'
+_AUTHORIZATION_S = _intern(u'authorization')
+_PROXY_AUTHORIZATION_B = b'proxy-authorization'
+_PROXY_AUTHORIZATION_S = _intern(u'proxy-authorization')
+
 # A set of headers that are hop-by-hop or connection-specific and thus
 # forbidden in HTTP/2. This list comes from RFC 7540 § 8.1.2.2.
 CONNECTION_HEADERS = frozenset([
-    b'connection', u'connection',
-    b'proxy-connection', u'proxy-connection',
-    b'keep-alive', u'keep-alive',
-    b'transfer-encoding', u'transfer-encoding',
-    b'upgrade', u'upgrade',
+    _CONNECTION_B, _CONNECTION_S,
+    _PROXY_CONNECTION_B, _PROXY_CONNECTION_S,
+    _KEEP_ALIVE_B, _KEEP_ALIVE_S,
+    _TRANSFER_ENCODING_B, _TRANSFER_ENCODING_S,
+    _UPGRADE_B, _UPGRADE_S,
 ])
 
 
 _ALLOWED_PSEUDO_HEADER_FIELDS = frozenset([
-    b':method', u':method',
-    b':scheme', u':scheme',
-    b':authority', u':authority',
-    b':path', u':path',
-    b':status', u':status',
+    _METHOD_B, _METHOD_S,
+    _SCHEME_B, _SCHEME_S,
+    _AUTHORITY_B, _AUTHORITY_S,
+    _PATH_B, _PATH_S,
+    _STATUS_B, _STATUS_S,
 ])
 
+# Classification side-table for the validation loops: maps the allowed
+# pseudo-header names to 1. One dict probe classifies a name, so the
+# common non-pseudo header pays a single lookup rather than a startswith
+# call plus a set probe; names missing from the table that still begin
+# with a colon are unknown pseudo-headers.
+_HEADER_KIND = dict.fromkeys(_ALLOWED_PSEUDO_HEADER_FIELDS, 1)
+
 
 _SECURE_HEADERS = frozenset([
     # May have basic credentials which are vulnerable to dictionary attacks.
-    b'authorization', u'authorization',
-    b'proxy-authorization', u'proxy-authorization',
+    _AUTHORIZATION_B, _AUTHORIZATION_S,
+    _PROXY_AUTHORIZATION_B, _PROXY_AUTHORIZATION_S,
 ])
 
+
+# Real connections send the same header names over and over, so rather than
+# re-classifying every name against the sets above we memoize the decision
+# in a bounded dict: 0 for not sensitive, 1 for always never-indexed, and 2
+# for never-indexed when the value is short (the cookie rule). The cache is
+# simply cleared when it fills, which bounds memory without any bookkeeping
+# on the hit path.
+_SECURE_DECISION_CACHE = {}
+_SECURE_CACHE_MAX = 4096
+
+
+def _secure_header_decision(name):
+    """
+    Classifies a header name for the never-indexing rules applied by
+    ``_secure_headers``, memoizing the decision.
+    """
+    decision = _SECURE_DECISION_CACHE.get(name)
+    if decision is None:
+        if name in _SECURE_HEADERS:
+            decision = 1
+        elif name in _COOKIE:
+            decision = 2
+        else:
+            decision = 0
+        if len(_SECURE_DECISION_CACHE) >= _SECURE_CACHE_MAX:
+            _SECURE_DECISION_CACHE.clear()
+        _SECURE_DECISION_CACHE[name] = decision
+    return decision
+
+
+# Precomputed frozensets holding both the byte and Unicode spellings of
+# header names that the hot loops below need to test against. A frozenset
+# membership test is a single hash lookup, where the older
+# ``name in (b'x', u'x')`` idiom built a tuple and did two equality probes
+# per header.
+_METHOD = frozenset([_METHOD_B, _METHOD_S])
+_TE = frozenset([_TE_B, _TE_S])
+_TRAILERS = frozenset([_TRAILERS_B, _TRAILERS_S])
+_COOKIE = frozenset([_COOKIE_B, _COOKIE_S])
+_AUTHORITY = frozenset([_AUTHORITY_B, _AUTHORITY_S])
+_HOST = frozenset([_HOST_B, _HOST_S])
+_STATUS = frozenset([_STATUS_B, _STATUS_S])
+
+# Testing ``name[:1] in _COLON`` spots a pseudo-header without branching on
+# the type of the name: slicing yields a length-one bytestring or string as
+# appropriate, unlike indexing, which yields an integer for bytes.
+_COLON = frozenset([b':', u':'])
+_INFORMATIONAL_START = frozenset([b'1', u'1'])
+
 if sys.version_info[0] == 2:  # Python 2.X
     _WHITESPACE = frozenset(whitespace)
 else:  # Python 3.3+
@@ -67,9 +179,8 @@ def _secure_headers(headers, hdr_validation_flags):
     and nghttp2.
     """
     for header in headers:
-        if header[0] in _SECURE_HEADERS:
-            yield NeverIndexedHeaderTuple(*header)
-        elif header[0] in (b'cookie', u'cookie') and len(header[1]) < 20:
+        decision = _secure_header_decision(header[0])
+        if decision == 1 or (decision == 2 and len(header[1]) < 20):
             yield NeverIndexedHeaderTuple(*header)
         else:
             yield header
@@ -80,7 +191,7 @@ def extract_method_header(headers):
     Extracts the request method from the headers list.
     """
     for k, v in headers:
-        if k in (b':method', u':method'):
+        if k in _METHOD:
             if not isinstance(v, bytes):
                 return v.encode('utf-8')
             else:
@@ -98,26 +209,21 @@ def is_informational_response(headers):
     :param headers: The HTTP/2 header block.
     :returns: A boolean indicating if this is an informational response.
     """
-    for n, v in headers:
-        if isinstance(n, bytes):
-            sigil = b':'
-            status = b':status'
-            informational_start = b'1'
-        else:
-            sigil = u':'
-            status = u':status'
-            informational_start = u'1'
-
+    # All of the tests here run against frozensets holding both the byte and
+    # Unicode spellings of the constants, so there is no need to branch on
+    # the type of each header name: headers that came from the user may mix
+    # bytes and Unicode freely within a single block.
+    for header in headers:
         # If we find a non-special header, we're done here: stop looping.
-        if not n.startswith(sigil):
+        if header[0][:1] not in _COLON:
             return False
 
         # This isn't the status header, bail.
-        if n != status:
+        if header[0] not in _STATUS:
             continue
 
         # If the first digit is a 1, we've got informational headers.
-        return v.startswith(informational_start)
+        return header[1][:1] in _INFORMATIONAL_START
 
 
 def guard_increment_window(current, increment):
@@ -130,9 +236,6 @@ def guard_increment_window(current, increment):
     :returns: The new value of the window.
     :raises: ``FlowControlError``
     """
-    # The largest value the flow control window may take.
-    LARGEST_FLOW_CONTROL_WINDOW = 2**31 - 1
-
     new_size = current + increment
 
     if new_size > LARGEST_FLOW_CONTROL_WINDOW:
@@ -161,18 +264,95 @@ def authority_from_headers(headers):
         # This gets run against headers that come both from HPACK and from the
         # user, so we may have unicode floating around in here. We only want
         # bytes.
-        if n in (b':authority', u':authority'):
+        if n in _AUTHORITY:
             return v.encode('utf-8') if not isinstance(v, bytes) else v
 
     return None
 
 
+class TrustedHeaderTuple(HeaderTuple):
+    """
+    A ``HeaderTuple`` that is known to be well-formed already: built by our
+    own code from constants, rather than supplied by the user. The outbound
+    normalization loop passes these through untouched, skipping the
+    lowercasing and whitespace-stripping allocations.
+    """
+    pass
+
+
 # Flags used by the validate_headers pipeline to determine which checks
-# should be applied to a given set of headers.
+# should be applied to a given set of headers. ``is_trusted`` may be set for
+# header blocks that our own code built from known-good values, in which
+# case outbound normalization and validation are skipped entirely.
 HeaderValidationFlags = collections.namedtuple(
     'HeaderValidationFlags',
-    ['is_client', 'is_trailer', 'is_response_header', 'is_push_promise']
+    [
+        'is_client', 'is_trailer', 'is_response_header', 'is_push_promise',
+        'is_trusted',
+    ]
 )
+# Not all callers know about is_trusted, so give it a default. Assigning to
+# __new__.__defaults__ works on all the Pythons we support, unlike the
+# ``defaults`` argument to namedtuple.
+HeaderValidationFlags.__new__.__defaults__ = (False,)
+
+# The flags are all booleans, so only 32 distinct instances can exist.
+# Prebuild them all so that the frame-processing path hands out shared
+# singletons instead of allocating a fresh namedtuple per header block.
+_FLAGS_CACHE = [
+    HeaderValidationFlags(
+        bool(i & 1), bool(i & 2), bool(i & 4), bool(i & 8), bool(i & 16)
+    )
+    for i in range(32)
+]
+
+
+def make_header_validation_flags(is_client, is_trailer, is_response_header,
+                                 is_push_promise, is_trusted=False):
+    """
+    Returns the shared HeaderValidationFlags instance for this combination
+    of flags.
+    """
+    return _FLAGS_CACHE[
+        (1 if is_client else 0) |
+        (2 if is_trailer else 0) |
+        (4 if is_response_header else 0) |
+        (8 if is_push_promise else 0) |
+        (16 if is_trusted else 0)
+    ]
+
+
+def _validate_header_name(name):
+    """
+    Rejects names containing uppercase characters, surrounded by
+    whitespace, or containing embedded NUL/CR/LF, all in a single compiled
+    scan. Long bytes names take the optional JIT-compiled scanner when
+    Numba is installed; below ~16 bytes the call overhead outweighs the
+    win, so short names stick with the regex.
+    """
+    if isinstance(name, bytes):
+        if _FAST_SCAN and len(name) >= 16:
+            bad_name = scan_header_name(name)
+        else:
+            bad_name = _BAD_NAME_RE.search(name)
+    else:
+        bad_name = _BAD_NAME_RE_U.search(name)
+    if bad_name:
+        raise ProtocolError(
+            "Received header name with forbidden characters %r" % name)
+
+
+def _validate_value_edges(value):
+    """
+    Rejects values surrounded by whitespace. For compatibility with RFC
+    7230 header fields, we need to allow the field value to be an empty
+    string. This is ludicrous, but technically allowed.
+    """
+    if value and ((value[0] in _WHITESPACE) or
+       (value[-1] in _WHITESPACE)):
+        raise ProtocolError(
+            "Received header value surrounded by whitespace %r" % value
+        )
 
 
 def validate_headers(headers, hdr_validation_flags):
@@ -182,35 +362,184 @@ def validate_headers(headers, hdr_validation_flags):
     :param headers: The HTTP header set.
     :param hdr_validation_flags: An instance of HeaderValidationFlags.
     """
-    # This validation logic is built on a sequence of generators that are
-    # iterated over to provide the final header list. This reduces some of the
-    # overhead of doing this checking. However, it's worth noting that this
-    # checking remains somewhat expensive, and attempts should be made wherever
-    # possible to reduce the time spent doing them.
+    # This validation logic runs all of the per-header checks in a single
+    # loop, rather than chaining one generator per check: paying one Python
+    # frame and one iteration per header rather than one per check is a
+    # substantial win on this hot path. It's worth noting that this checking
+    # remains somewhat expensive, and attempts should be made wherever
+    # possible to reduce the time spent doing it.
     #
-    # For example, we avoid tuple upacking in loops because it represents a
+    # For example, we avoid tuple unpacking in loops because it represents a
     # fixed cost that we don't want to spend, instead indexing into the header
     # tuples.
-    headers = _reject_uppercase_header_fields(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_surrounding_whitespace(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_te(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_connection_header(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_pseudo_header_fields(
-        headers, hdr_validation_flags
-    )
-    headers = _check_host_authority_header(
-        headers, hdr_validation_flags
+    #
+    # When the caller hands us a list or tuple — the common case — the output
+    # is pre-sized to the input length, skipping the amortized reallocation
+    # that list.append pays as the list grows.
+    presized = isinstance(headers, (list, tuple))
+    out = [None] * len(headers) if presized else []
+    index = 0
+    seen_pseudo_header_fields = set()
+    block_state = {'regular': False, 'authority': None, 'host': None}
+
+    for header in headers:
+        name = header[0]
+
+        _validate_header_name(name)
+        _validate_value_edges(header[1])
+        _validate_te_header(name, header[1])
+
+        # Reject connection-specific header fields.
+        if name in CONNECTION_HEADERS:
+            raise ProtocolError(
+                "Connection-specific header field present: %s." % name
+            )
+
+        _track_pseudo_header(
+            name, header[1], seen_pseudo_header_fields, block_state
+        )
+
+        if presized:
+            out[index] = header
+            index += 1
+        else:
+            out.append(header)
+
+    if presized:
+        del out[index:]
+
+    _check_block_constraints(
+        hdr_validation_flags, seen_pseudo_header_fields, block_state
     )
 
-    return list(headers)
+    return out
+
+
+def _assert_host_authority_match(authority_header_val, host_header_val):
+    """
+    Given the values of the :authority and Host headers from a request block
+    that isn't a trailer (``None`` if the header was absent), check that:
+     1. At least one of these headers is set.
+     2. If both headers are set, they match.
+
+    :raises: ``ProtocolError``
+    """
+    # If we have not-None values for these variables, then we know we saw
+    # the corresponding header.
+    authority_present = (authority_header_val is not None)
+    host_present = (host_header_val is not None)
+
+    # It is an error for a request header block to contain neither
+    # an :authority header nor a Host header.
+    if not authority_present and not host_present:
+        raise ProtocolError(
+            "Request header block does not have an :authority or Host header."
+        )
+
+    # If we receive both headers, they should definitely match.
+    if authority_present and host_present:
+        if authority_header_val != host_header_val:
+            raise ProtocolError(
+                "Request header block has mismatched :authority and "
+                "Host headers: %r / %r"
+                % (authority_header_val, host_header_val)
+            )
+
+
+def _validate_te_header(name, value):
+    """
+    Raises a ProtocolError if this is a TE header carrying any value other
+    than "trailers". Checking the length first means we only pay for the
+    .lower() allocation when the value is the right length to possibly
+    match.
+    """
+    if name in _TE:
+        if len(value) != 8 or value.lower() not in _TRAILERS:
+            raise ProtocolError(
+                "Invalid value for Transfer-Encoding header: %s" % value
+            )
+
+
+def _track_pseudo_header(name, value, seen_pseudo_header_fields, block_state):
+    """
+    Classifies a single header as pseudo or regular, raising a
+    ProtocolError for duplicate, misplaced, and custom pseudo-header
+    fields. Records what the block-level checks need in ``block_state``:
+    whether a regular header has been seen, and the values of the
+    :authority and Host headers.
+    """
+    # One dict probe classifies the name: the usual case of a regular
+    # header falls straight through to the else branch.
+    if _HEADER_KIND.get(name) == 1:
+        if name in seen_pseudo_header_fields:
+            raise ProtocolError(
+                "Received duplicate pseudo-header field %s" % name
+            )
+
+        seen_pseudo_header_fields.add(name)
+
+        if block_state['regular']:
+            raise ProtocolError(
+                "Received pseudo-header field out of sequence: %s" % name
+            )
+
+        # Record the :authority header so that the block-level checks can
+        # cross-check it against Host. We don't need to worry about
+        # duplicate :authority headers, as those are rejected above. Only
+        # pseudo-headers can match here, so regular headers never pay for
+        # this probe.
+        #
+        # TODO: We should also guard against receiving duplicate Host
+        # headers, and against sending duplicate headers.
+        if name in _AUTHORITY:
+            block_state['authority'] = value
+    elif name[:1] in _COLON:
+        raise ProtocolError(
+            "Received custom pseudo-header field %s" % name
+        )
+    else:
+        block_state['regular'] = True
+
+        # Host is an ordinary header, so it can only appear here.
+        if name in _HOST:
+            block_state['host'] = value
+
+
+def _check_block_constraints(hdr_validation_flags, seen_pseudo_header_fields,
+                             block_state):
+    """
+    Runs the whole-block checks once a header block has been walked:
+    trailers may not carry pseudo-headers, responses must carry :status,
+    and requests must carry consistent :authority/Host headers.
+    """
+    # Pseudo-header fields MUST NOT appear in trailers - RFC 7540 § 8.1.2.1
+    if hdr_validation_flags.is_trailer and seen_pseudo_header_fields:
+        raise ProtocolError(
+            "Received pseudo-header in trailer %s" %
+            seen_pseudo_header_fields
+        )
+
+    # If ':status' pseudo-header is not there in a response header, reject it
+    # Relevant RFC section: RFC 7540 § 8.1.2.4
+    # https://tools.ietf.org/html/rfc7540#section-8.1.2.4
+    if hdr_validation_flags.is_response_header:
+        seen_status_field = (
+            _STATUS_B in seen_pseudo_header_fields or
+            _STATUS_S in seen_pseudo_header_fields
+        )
+        if not seen_status_field:
+            raise ProtocolError(
+                "Response header block does not have a :status header"
+            )
+
+    # We only expect to see :authority and Host headers on request header
+    # blocks that aren't trailers, so skip this validation if this is a
+    # response header or we're looking at trailer blocks.
+    if not (hdr_validation_flags.is_response_header or
+            hdr_validation_flags.is_trailer):
+        _assert_host_authority_match(
+            block_state['authority'], block_state['host']
+        )
 
 
 def _reject_uppercase_header_fields(headers, hdr_validation_flags):
@@ -253,8 +582,8 @@ def _reject_te(headers, hdr_validation_flags):
     its value is anything other than "trailers".
     """
     for header in headers:
-        if header[0] in (b'te', u'te'):
-            if header[1].lower() not in (b'trailers', u'trailers'):
+        if header[0] in _TE:
+            if len(header[1]) != 8 or header[1].lower() not in _TRAILERS:
                 raise ProtocolError(
                     "Invalid value for Transfer-Encoding header: %s" %
                     header[1]
@@ -277,17 +606,6 @@ def _reject_connection_header(headers, hdr_validation_flags):
         yield header
 
 
-def _custom_startswith(test_string, bytes_prefix, unicode_prefix):
-    """
-    Given a string that might be a bytestring or a Unicode string,
-    return True if it starts with the appropriate prefix.
-    """
-    if isinstance(test_string, bytes):
-        return test_string.startswith(bytes_prefix)
-    else:
-        return test_string.startswith(unicode_prefix)
-
-
 def _reject_pseudo_header_fields(headers, hdr_validation_flags):
     """
     Raises a ProtocolError if duplicate pseudo-header fields are found in a
@@ -300,7 +618,7 @@ def _reject_pseudo_header_fields(headers, hdr_validation_flags):
     seen_regular_header = False
 
     for header in headers:
-        if _custom_startswith(header[0], b':', u':'):
+        if header[0][:1] in _COLON:
             if header[0] in seen_pseudo_header_fields:
                 raise ProtocolError(
                     "Received duplicate pseudo-header field %s" % header[0]
@@ -336,8 +654,8 @@ def _reject_pseudo_header_fields(headers, hdr_validation_flags):
     # https://tools.ietf.org/html/rfc7540#section-8.1.2.4
     if hdr_validation_flags.is_response_header:
         seen_status_field = (
-            b':status' in seen_pseudo_header_fields or
-            u':status' in seen_pseudo_header_fields
+            _STATUS_B in seen_pseudo_header_fields or
+            _STATUS_S in seen_pseudo_header_fields
         )
         if not seen_status_field:
             raise ProtocolError(
@@ -358,7 +676,7 @@ def _validate_host_authority_header(headers):
     # We use None as a sentinel value.  Iterate over the list of headers,
     # and record the value of these headers (if present).  We don't need
     # to worry about receiving duplicate :authority headers, as this is
-    # enforced by the _reject_pseudo_header_fields() pipeline.
+    # enforced by the pseudo-header field checks.
     #
     # TODO: We should also guard against receiving duplicate Host headers,
     # and against sending duplicate headers.
@@ -366,33 +684,14 @@ def _validate_host_authority_header(headers):
     host_header_val = None
 
     for header in headers:
-        if header[0] in (b':authority', u':authority'):
+        if header[0] in _AUTHORITY:
             authority_header_val = header[1]
-        elif header[0] in (b'host', u'host'):
+        elif header[0] in _HOST:
             host_header_val = header[1]
 
         yield header
 
-    # If we have not-None values for these variables, then we know we saw
-    # the corresponding header.
-    authority_present = (authority_header_val is not None)
-    host_present = (host_header_val is not None)
-
-    # It is an error for a request header block to contain neither
-    # an :authority header nor a Host header.
-    if not authority_present and not host_present:
-        raise ProtocolError(
-            "Request header block does not have an :authority or Host header."
-        )
-
-    # If we receive both headers, they should definitely match.
-    if authority_present and host_present:
-        if authority_header_val != host_header_val:
-            raise ProtocolError(
-                "Request header block has mismatched :authority and "
-                "Host headers: %r / %r"
-                % (authority_header_val, host_header_val)
-            )
+    _assert_host_authority_match(authority_header_val, host_header_val)
 
 
 def _check_host_authority_header(headers, hdr_validation_flags):
@@ -469,6 +768,148 @@ def _check_sent_host_authority_header(headers, hdr_validation_flags):
     return _validate_host_authority_header(headers)
 
 
+def _normalize_outbound_header(header):
+    """
+    Lowercases a header name and strips surrounding whitespace from both
+    the name and the value, preserving the original type of the header
+    tuple for tuple and any ``HeaderTuple``.
+
+    Clean bytes headers are returned untouched, skipping the copies that
+    .lower() and .strip() would otherwise allocate. _BAD_NAME_RE is
+    slightly stricter than necessary for this test (it also matches
+    embedded control characters, which lowercasing can't fix), but a false
+    positive just means a wasted rebuild. Text headers are always rebuilt:
+    str.strip() removes every Unicode whitespace character, far more than
+    the ASCII-only patterns can see, so there is no cheap cleanliness test
+    for them.
+    """
+    if isinstance(header[0], bytes) and isinstance(header[1], bytes):
+        if not (_BAD_NAME_RE.search(header[0]) or
+                _WS_EDGE_RE.search(header[1])):
+            return header
+
+    if isinstance(header, HeaderTuple):
+        return header.__class__(header[0].lower().strip(), header[1].strip())
+    return (header[0].lower().strip(), header[1].strip())
+
+
+def _maybe_never_indexed(header):
+    """
+    Certain headers are at risk of being attacked during the header
+    compression phase, and so need to be kept out of header compression
+    contexts: see ``_secure_headers`` for the detail of these rules.
+    Returns the header unchanged, or wrapped in a NeverIndexedHeaderTuple.
+    """
+    decision = _secure_header_decision(header[0])
+    if decision == 1 or (decision == 2 and len(header[1]) < 20):
+        return NeverIndexedHeaderTuple(*header)
+    return header
+
+
+def _prepare_one_header(header, normalize, validate,
+                        seen_pseudo_header_fields, block_state):
+    """
+    Applies the per-header normalization and validation steps of
+    ``prepare_outbound_headers`` to a single header, returning the
+    (possibly rebuilt) header, or ``None`` if it should be stripped from
+    the block.
+    """
+    # Individual trusted headers are already normalized: leave them
+    # untouched, though they still take the validation checks below.
+    if normalize and type(header) is not TrustedHeaderTuple:
+        header = _normalize_outbound_header(header)
+
+    name = header[0]
+
+    # Connection-specific header fields are forbidden by RFC7540
+    # § 8.1.2.2: when normalizing we silently strip them, otherwise
+    # they're a validation error.
+    if name in CONNECTION_HEADERS:
+        if normalize:
+            return None
+        raise ProtocolError(
+            "Connection-specific header field present: %s." % name
+        )
+
+    if validate:
+        _validate_te_header(name, header[1])
+        _track_pseudo_header(
+            name, header[1], seen_pseudo_header_fields, block_state
+        )
+
+    if normalize:
+        header = _maybe_never_indexed(header)
+
+    return header
+
+
+def _prepare_headers_loop(headers, normalize, validate,
+                          seen_pseudo_header_fields, block_state):
+    """
+    Runs ``_prepare_one_header`` over a header block, collecting the
+    results into a list. Pre-sizes the output for list and tuple inputs,
+    as validate_headers does; stripped connection headers leave a tail of
+    unused slots that is trimmed after the loop.
+    """
+    presized = isinstance(headers, (list, tuple))
+    out = [None] * len(headers) if presized else []
+    index = 0
+
+    for header in headers:
+        header = _prepare_one_header(
+            header, normalize, validate, seen_pseudo_header_fields,
+            block_state
+        )
+        if header is None:
+            continue
+
+        if presized:
+            out[index] = header
+            index += 1
+        else:
+            out.append(header)
+
+    if presized:
+        del out[index:]
+
+    return out
+
+
+def prepare_outbound_headers(headers, hdr_validation_flags,
+                             normalize=True, validate=True):
+    """
+    Normalizes and validates a header sequence that we are about to send,
+    in a single pass over the block. Either step can be switched off, which
+    the connection does when the corresponding configuration flag is unset.
+
+    :param headers: The HTTP header set.
+    :param hdr_validation_flags: An instance of HeaderValidationFlags.
+    :param normalize: Whether to normalize the headers.
+    :param validate: Whether to validate the headers.
+    """
+    if not (normalize or validate):
+        return headers
+
+    # Header blocks that our own code built from known-good values don't
+    # need any of this.
+    if getattr(hdr_validation_flags, 'is_trusted', False):
+        return headers
+
+    seen_pseudo_header_fields = set()
+    block_state = {'regular': False, 'authority': None, 'host': None}
+
+    out = _prepare_headers_loop(
+        headers, normalize, validate, seen_pseudo_header_fields, block_state
+    )
+
+    if validate:
+        _check_block_constraints(
+            hdr_validation_flags, seen_pseudo_header_fields, block_state
+        )
+
+    return out
+
+
 def normalize_outbound_headers(headers, hdr_validation_flags):
     """
     Normalizes a header sequence that we are about to send.
@@ -476,32 +917,31 @@ def normalize_outbound_headers(headers, hdr_validation_flags):
     :param headers: The HTTP header set.
     :param hdr_validation_flags: An instance of HeaderValidationFlags.
     """
-    headers = _lowercase_header_names(headers, hdr_validation_flags)
-    headers = _strip_surrounding_whitespace(headers, hdr_validation_flags)
-    headers = _strip_connection_headers(headers, hdr_validation_flags)
-    headers = _secure_headers(headers, hdr_validation_flags)
-
-    return headers
+    return prepare_outbound_headers(
+        headers, hdr_validation_flags, validate=False
+    )
 
 
 def validate_outbound_headers(headers, hdr_validation_flags):
     """
-    Validates and normalizes a header sequence that we are about to send.
+    Validates a header sequence that we are about to send.
 
     :param headers: The HTTP header set.
     :param hdr_validation_flags: An instance of HeaderValidationFlags.
     """
-    headers = _reject_te(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_connection_header(
-        headers, hdr_validation_flags
-    )
-    headers = _reject_pseudo_header_fields(
-        headers, hdr_validation_flags
-    )
-    headers = _check_sent_host_authority_header(
-        headers, hdr_validation_flags
+    return prepare_outbound_headers(
+        headers, hdr_validation_flags, normalize=False
     )
 
-    return headers
+
+# If the optional Cython-compiled copy of the inbound validator has been
+# built, use it in place of the pure-Python implementation above, which
+# remains authoritative for its behaviour.
+try:
+    from ._validate import validate_headers_c
+except ImportError:  # Platform-specific: extension not built.
+    validate_headers_c = None
+
+if validate_headers_c is not None:
+    _validate_headers_py = validate_headers
+    validate_headers = validate_headers_c
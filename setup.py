@@ -30,6 +30,16 @@ packages = [
     'h2',
 ]
 
+# Optionally compile the validation fast path. The package is pure Python
+# and fully functional without it: the extension is only built when Cython
+# is available.
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(['h2/_validate.pyx'])
+
 readme = codecs.open('README.rst', encoding='utf-8').read()
 history = codecs.open('HISTORY.rst', encoding='utf-8').read()
 
@@ -42,6 +52,7 @@ setup(
     author_email='cory@lukasa.co.uk',
     url='http://hyper.rtfd.org',
     packages=packages,
+    ext_modules=ext_modules,
     package_data={'': ['LICENSE', 'README.rst', 'CONTRIBUTORS.rst', 'HISTORY.rst', 'NOTICES']},
     package_dir={'h2': 'h2'},
     include_package_data=True,
@@ -5,14 +5,23 @@ test_utility_functions
 
 Tests for the various utility functions provided by hyper-h2.
 """
+import sys
+
 import pytest
 
 import h2.connection
 import h2.errors
 import h2.events
 import h2.exceptions
+import h2._fast_validate
+import h2.utilities
 from h2.utilities import extract_method_header
 
+try:
+    from importlib import reload as reload_module
+except ImportError:  # Platform-specific: Python 2
+    reload_module = reload  # noqa
+
 # These tests require a non-list-returning range function.
 try:
     range = xrange
@@ -174,3 +183,212 @@ class TestExtractHeader(object):
     )
     def test_extract_header_method(self, headers):
         assert extract_method_header(headers) == b'GET'
+
+
+class TestTrustedHeaders(object):
+    """
+    Header blocks that our own code built from known-good values can opt
+    out of outbound processing, either wholesale via the ``is_trusted``
+    validation flag or per-header via ``TrustedHeaderTuple``.
+    """
+    flags = h2.utilities.make_header_validation_flags(
+        is_client=True, is_trailer=False, is_response_header=False,
+        is_push_promise=False,
+    )
+    trusted_flags = h2.utilities.make_header_validation_flags(
+        is_client=True, is_trailer=False, is_response_header=False,
+        is_push_promise=False, is_trusted=True,
+    )
+
+    def test_is_trusted_defaults_to_false(self):
+        """
+        Callers that don't know about is_trusted build untrusted flags.
+        """
+        flags = h2.utilities.HeaderValidationFlags(
+            is_client=True, is_trailer=False, is_response_header=False,
+            is_push_promise=False,
+        )
+        assert flags.is_trusted is False
+        assert self.flags.is_trusted is False
+        assert self.trusted_flags.is_trusted is True
+
+    def test_trusted_block_is_returned_untouched(self):
+        """
+        A block marked trusted skips normalization and validation entirely:
+        it comes back as the same object, even though it would otherwise be
+        rewritten (and rejected) by both steps.
+        """
+        headers = [(b'UPPER', b' padded '), (b'connection', b'close')]
+        result = h2.utilities.prepare_outbound_headers(
+            headers, self.trusted_flags
+        )
+        assert result is headers
+
+    def test_untrusted_block_is_still_processed(self):
+        """
+        The same block without the trusted flag takes the normal path.
+        """
+        headers = [(b'UPPER', b' padded '), (b'connection', b'close')]
+        result = h2.utilities.normalize_outbound_headers(headers, self.flags)
+        assert result == [(b'upper', b'padded')]
+
+    def test_trusted_header_tuple_skips_normalization(self):
+        """
+        An individual TrustedHeaderTuple passes through the normalization
+        loop untouched, while its neighbours are still rebuilt.
+        """
+        trusted = h2.utilities.TrustedHeaderTuple(b'X-Mixed', b' padded ')
+        plain = (b'X-Mixed', b' padded ')
+        result = h2.utilities.normalize_outbound_headers(
+            [trusted, plain], self.flags
+        )
+        assert result[0] is trusted
+        assert result[1] == (b'x-mixed', b'padded')
+
+
+class TestFastHeaderNameScan(object):
+    """
+    The optional JIT-compiled header-name scanner must agree with the
+    regex scan it replaces, and its absence must leave the validation code
+    fully functional.
+    """
+    # Names chosen to hit every rejection rule at both short and long
+    # (>= 16 bytes, where the validator prefers the scanner) lengths.
+    header_names = [
+        b'ok',
+        b'x-a-perfectly-reasonable-header',
+        b'UPPER',
+        b'x-large-header-name-With-uppercase',
+        b' leading-whitespace',
+        b'\ttab-leading-large-header-name',
+        b'trailing-whitespace ',
+        b'trailing-large-header-name\x0b',
+        b'embedded\x00nul',
+        b'embedded\rcarriage-return-name',
+        b'embedded\nnewline-header-name',
+        b'',
+    ]
+
+    @pytest.mark.skipif(
+        h2._fast_validate.scan_header_name is None,
+        reason="Numba is not installed"
+    )
+    @pytest.mark.parametrize('name', header_names)
+    def test_matches_regex_scan(self, name):
+        """
+        The scanner flags exactly the names the regex flags.
+        """
+        scanned = h2._fast_validate.scan_header_name(name)
+        assert bool(scanned) == bool(h2.utilities._BAD_NAME_RE.search(name))
+
+    @pytest.mark.skipif(
+        h2._fast_validate.scan_header_name is None,
+        reason="Numba is not installed"
+    )
+    def test_bit_packed_status(self):
+        """
+        Each rejection rule sets its documented status bit.
+        """
+        scan = h2._fast_validate.scan_header_name
+        assert scan(b'SHOUTING-header-name') & 1
+        assert scan(b' padded-header-name ') & 2
+        assert scan(b'split\r\nheader-name') & 4
+
+    def test_falls_back_cleanly_without_numba(self):
+        """
+        When Numba or NumPy can't be imported, the module still imports
+        and publishes ``scan_header_name = None``.
+        """
+        missing = object()
+        saved = {
+            module_name: sys.modules.get(module_name, missing)
+            for module_name in ('numba', 'numpy')
+        }
+        sys.modules.update({'numba': None, 'numpy': None})
+        try:
+            reloaded = reload_module(h2._fast_validate)
+            assert reloaded.scan_header_name is None
+        finally:
+            for module_name, module in saved.items():
+                if module is missing:
+                    del sys.modules[module_name]
+                else:
+                    sys.modules[module_name] = module
+            reload_module(h2._fast_validate)
+
+
+class TestCompiledValidator(object):
+    """
+    The optional Cython-compiled copy of the inbound validator must agree
+    with the pure-Python implementation, which is authoritative for its
+    behaviour. These tests only run when the extension has been built.
+    """
+    request_flags = h2.utilities.make_header_validation_flags(
+        is_client=False, is_trailer=False, is_response_header=False,
+        is_push_promise=False,
+    )
+    trailer_flags = h2.utilities.make_header_validation_flags(
+        is_client=False, is_trailer=True, is_response_header=False,
+        is_push_promise=False,
+    )
+    response_flags = h2.utilities.make_header_validation_flags(
+        is_client=True, is_trailer=False, is_response_header=True,
+        is_push_promise=False,
+    )
+
+    base_request_headers = [
+        (b':authority', b'example.com'),
+        (b':path', b'/'),
+        (b':scheme', b'https'),
+        (b':method', b'GET'),
+        (b'user-agent', b'someua/0.0.1'),
+    ]
+
+    # A mixture of blocks the validator accepts and blocks it rejects,
+    # including the awkward edge cases: text headers, values with
+    # surrounding whitespace, and block-level constraint violations.
+    header_blocks = [
+        (base_request_headers, request_flags),
+        ([(u':authority', u'example.com'), (u':path', u'/'),
+          (u':scheme', u'https'), (u':method', u'GET')], request_flags),
+        (base_request_headers + [(b'UPPERCASE', b'foo')], request_flags),
+        (base_request_headers + [(b'padded', b' foo ')], request_flags),
+        (base_request_headers + [(b'empty', b'')], request_flags),
+        ([(u':authority', u'example.com'), (u':path', u'/'),
+          (u':scheme', u'https'), (u':method', u'GET'),
+          (u'padded', u' foo ')], request_flags),
+        (base_request_headers + [(b'te', b'trailers')], request_flags),
+        (base_request_headers + [(b'te', b'chunked')], request_flags),
+        (base_request_headers + [(b'connection', b'close')], request_flags),
+        (base_request_headers + [(b':custom', b'pseudo')], request_flags),
+        (base_request_headers + [(b':method', b'GET')], request_flags),
+        ([(b'ordinary', b'header')] + base_request_headers, request_flags),
+        ([(b'host', b'example.com')], request_flags),
+        (base_request_headers + [(b'host', b'example.com')], request_flags),
+        (base_request_headers + [(b'host', b'other.com')], request_flags),
+        ([(b'user-agent', b'someua/0.0.1')], request_flags),
+        ([(b'trailing', b'header')], trailer_flags),
+        ([(b':status', b'200')], trailer_flags),
+        ([(b':status', b'200')], response_flags),
+        ([(b'server', b'fake-serv/0.1.0')], response_flags),
+    ]
+
+    @pytest.mark.parametrize('headers,flags', header_blocks)
+    def test_matches_python_validator(self, headers, flags):
+        """
+        For each header block, the compiled validator raises exactly when
+        the pure-Python one raises, and returns the same headers otherwise.
+        """
+        compiled = pytest.importorskip('h2._validate')
+        python_validate = getattr(
+            h2.utilities, '_validate_headers_py', h2.utilities.validate_headers
+        )
+
+        try:
+            expected = python_validate(list(headers), flags)
+        except h2.exceptions.ProtocolError:
+            with pytest.raises(h2.exceptions.ProtocolError):
+                compiled.validate_headers_c(list(headers), flags)
+        else:
+            result = compiled.validate_headers_c(list(headers), flags)
+            assert result == expected